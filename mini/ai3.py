@@ -73,6 +73,9 @@ WINDOWS_CMD_MAP = {
     'which': 'where',
 }
 
+# Longest key first so 'rm -rf' wins over 'rm'; sorted once at import
+WIN_CMD_KEYS_BY_LEN: Tuple[str, ...] = tuple(sorted(WINDOWS_CMD_MAP, key=len, reverse=True))
+
 # ==============================================================================
 # VIBE UTILS & SYSTEM PROMPT
 # ==============================================================================
@@ -137,11 +140,9 @@ class VibeUtils:
         """Convert common Unix commands to Windows equivalents (Smart Match)."""
         cmd_lower = command.lower().strip()
         
-        # Sort keys by length (longest first) to prevent 'rm' catching 'rm -rf'
+        # Keys pre-sorted longest first to prevent 'rm' catching 'rm -rf'
         # This ensures specific commands match before general ones
-        sorted_keys = sorted(WINDOWS_CMD_MAP.keys(), key=len, reverse=True)
-        
-        for unix_cmd in sorted_keys:
+        for unix_cmd in WIN_CMD_KEYS_BY_LEN:
             # Check if command STARTS with the unix_cmd
             if cmd_lower.startswith(unix_cmd):
                 # CRITICAL CHECK: Ensure it's a whole word match
@@ -5,6 +5,7 @@ Used by VibeCLI to inject full codebase context into AI conversations.
 
 import os
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
 
 # --- Configuration ---
 SKIPPED_NAMES = {
@@ -18,17 +19,34 @@ SKIPPED_EXTENSIONS = {
     '.png', '.jpg', '.jpeg', '.gif', '.ico', '.svg', '.webp',
     '.woff', '.woff2', '.ttf', '.eot', '.otf',
     '.exe', '.dll', '.so', '.dylib', '.pyc', '.class', '.jar',
-    '.pdf', '.zip', '.tar', '.gz', '.bak'
+    '.pdf', '.zip', '.tar', '.gz', '.bak',
+    '.lock', '.map', '.wasm'
 }
 
+# Multi-part suffixes that Path.suffix can't see
+SKIPPED_SUFFIXES = ('.min.js', '.min.css')
+
+# Content limits: bigger files, or files with a NUL byte near the start, are skipped
+MAX_FILE_BYTES = 256_000
+BINARY_PEEK_CHARS = 512
+
+# Concurrent reads; bounded to keep open file descriptors sane on large trees
+MAX_READ_WORKERS = 32
+
 def is_skipped(path: Path) -> bool:
     """Check if a file should be skipped based on name or extension."""
     if path.name in SKIPPED_NAMES:
         return True
     if path.suffix.lower() in SKIPPED_EXTENSIONS:
         return True
+    if path.name.lower().endswith(SKIPPED_SUFFIXES):
+        return True
     return False
 
+def looks_binary(content: str) -> bool:
+    """NUL survives utf-8 decoding, so a NUL in the head means binary data."""
+    return '\x00' in content[:BINARY_PEEK_CHARS]
+
 def scrape_contents(root_path: Path) -> str:
     """
     Scrapes file contents into a single formatted string.
@@ -39,7 +57,7 @@ def scrape_contents(root_path: Path) -> str:
     Returns:
         String containing all file contents with headers
     """
-    output_lines = []
+    file_paths = []
     
     # os.walk is used here because it allows us to modify 'dirs' in-place
     # to prevent recursing into skipped directories (like node_modules).
@@ -52,25 +70,41 @@ def scrape_contents(root_path: Path) -> str:
             file_path = Path(root) / file
             
             # 2. Skip specific files or extensions
-            if is_skipped(file_path):
-                continue
-                
-            # 3. Read and format content
-            try:
-                # Calculate relative path for cleaner output
-                rel_path = file_path.relative_to(root_path)
-                
-                output_lines.append(f"\n{'='*50}")
-                output_lines.append(f"FILE: {rel_path}")
-                output_lines.append(f"{'='*50}\n")
-                
-                # Force utf-8 and ignore errors (in case of unexpected binary files)
-                content = file_path.read_text(encoding='utf-8', errors='ignore')
-                output_lines.append(content)
-                output_lines.append("\n")
-                
-            except Exception as e:
-                output_lines.append(f"[Error reading file: {e}]")
+            if not is_skipped(file_path):
+                file_paths.append(file_path)
+    
+    # 3. Read and format content; map() keeps results in walk order
+    def read_one(file_path: Path) -> list:
+        lines = []
+        try:
+            # Calculate relative path for cleaner output
+            rel_path = file_path.relative_to(root_path)
+            
+            lines.append(f"\n{'='*50}")
+            lines.append(f"FILE: {rel_path}")
+            lines.append(f"{'='*50}\n")
+            
+            # Too large for context: skip without reading
+            if file_path.stat().st_size > MAX_FILE_BYTES:
+                return []
+            
+            # Force utf-8 and ignore errors (in case of unexpected binary files)
+            content = file_path.read_text(encoding='utf-8', errors='ignore')
+            if looks_binary(content):
+                return []
+            lines.append(content)
+            lines.append("\n")
+            
+        except Exception as e:
+            lines.append(f"[Error reading file: {e}]")
+        return lines
+    
+    with ThreadPoolExecutor(max_workers=MAX_READ_WORKERS) as ex:
+        results = list(ex.map(read_one, file_paths))
+    
+    output_lines = []
+    for lines in results:
+        output_lines.extend(lines)
 
     return "\n".join(output_lines)
 
@@ -12,13 +12,18 @@ import os
 import re
 import sys
 import shutil
+import signal
 import difflib
+import functools
 import subprocess
 import argparse
 import fnmatch
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from datetime import datetime
-from typing import List, Tuple, Dict, Optional
+from typing import List, Tuple, Dict, Optional, Iterator
 
 # --- Dependency Check ---
 try:
@@ -30,13 +35,27 @@ except ImportError:
     print("❌ Missing dependencies. Run: pip install openai python-dotenv colorama")
     sys.exit(1)
 
+# Optional: gitignore-style matcher (pip install pathspec); falls back to fnmatch
+try:
+    import pathspec
+except ImportError:
+    pathspec = None
+
 # ==============================================================================
 # CONFIGURATION
 # ==============================================================================
 
 MODEL_NAME = "google/gemini-2.5-flash-lite:nitro" # Or your preferred nitro model
+IS_WINDOWS = sys.platform.startswith('win')
 DANGEROUS_COMMANDS = {'format', 'del /s', 'rmdir /s', 'rd /s', 'shutdown', 'diskpart', 'mkfs', 'dd'}
 MAX_HISTORY_TURNS = 20
+MAX_DIFF_BYTES = 1_000_000 # Skip diffing files larger than this
+MAX_FILE_CONTEXT = 8192 # Per-file cap; keeps head + tail halves
+MAX_CONTEXT_CHARS = 200_000 # Total scrape cap sent to the LLM
+ELIDE_MSG_CHARS = 4096 # Old SYSTEM tool output above this gets summarized...
+ELIDE_AFTER_TURNS = 3 # ...once this many user turns have passed
+RUN_TAIL_LINES = 200 # Lines of RUN stdout/stderr kept for the LLM
+_SCAFFOLD_RE = re.compile(r'(?P<vite>create[- ]vite)|(?P<next>create-next-app)|(?P<shadcn>shadcn)', re.IGNORECASE)
 IGNORE_PATTERNS = [
     '.git', '__pycache__', 'node_modules', '.next', '.vibe', 'dist', 'build', 
     'coverage', '.DS_Store', 'Thumbs.db', '*.lock', '*.log', '*.png', '*.jpg', 
@@ -47,10 +66,22 @@ IGNORE_PATTERNS = [
 # 1. FILE SYSTEM INTELLIGENCE (The "Repo Reader" from V3)
 # ==============================================================================
 
+@functools.lru_cache(maxsize=32)
+def _ignore_spec(root_str: str):
+    """Compiles IGNORE_PATTERNS plus the root's .gitignore into one matcher (pathspec only)."""
+    lines = list(IGNORE_PATTERNS)
+    try:
+        lines += Path(root_str, ".gitignore").read_text(encoding='utf-8', errors='ignore').splitlines()
+    except OSError:
+        pass
+    return pathspec.PathSpec.from_lines('gitwildmatch', lines)
+
 class RepoContext:
     @staticmethod
     def should_ignore(path: Path, root: Path) -> bool:
         rel_path = path.relative_to(root).as_posix()
+        if pathspec is not None:
+            return _ignore_spec(str(root)).match_file(rel_path)
         name = path.name
         for pattern in IGNORE_PATTERNS:
             if fnmatch.fnmatch(name, pattern) or fnmatch.fnmatch(rel_path, pattern):
@@ -62,7 +93,7 @@ class RepoContext:
         """Generates a visual tree structure string using native Windows command if available, else python."""
         try:
             # Try native Windows tree first for speed
-            if sys.platform.startswith('win'):
+            if IS_WINDOWS:
                 res = subprocess.run("tree /f /a", shell=True, cwd=root_path, capture_output=True, text=True)
                 if res.returncode == 0:
                     return res.stdout
@@ -79,9 +110,10 @@ class RepoContext:
         return tree_str
 
     @staticmethod
-    def scrape(root_path: Path) -> str:
-        """Recursively reads all text files in the project."""
-        output = []
+    def scrape(root_path: Path) -> Iterator[str]:
+        """Recursively yields each text file as a '--- FILE ---' chunk (oversized files are elided)."""
+        total = 0
+        half = MAX_FILE_CONTEXT // 2
         for path in root_path.rglob('*'):
             if path.is_file() and not RepoContext.should_ignore(path, root_path):
                 try:
@@ -90,11 +122,17 @@ class RepoContext:
                         if b'\0' in f.read(1024): continue 
                     
                     content = path.read_text(encoding='utf-8', errors='ignore')
-                    rel_path = path.relative_to(root_path).as_posix()
-                    output.append(f"--- FILE: {rel_path} ---\n{content}\n")
                 except Exception:
-                    pass
-        return "\n".join(output)
+                    continue
+                if len(content) > MAX_FILE_CONTEXT:
+                    content = content[:half] + f"\n... [{len(content) - MAX_FILE_CONTEXT} chars elided] ...\n" + content[-half:]
+                rel_path = path.relative_to(root_path).as_posix()
+                chunk = f"--- FILE: {rel_path} ---\n{content}\n\n"
+                yield chunk
+                total += len(chunk)
+                if total > MAX_CONTEXT_CHARS:
+                    yield "... [context truncated]"
+                    return
 
 # ==============================================================================
 # 2. UTILITIES & TRANSLATORS
@@ -107,20 +145,27 @@ class VibeUtils:
         'rm': 'del', 'rm -rf': 'rmdir /s /q', 'mkdir -p': 'mkdir',
         'touch': 'type nul >', 'clear': 'cls', 'grep': 'findstr', 'which': 'where'
     }
-
-    @staticmethod
-    def normalize_path(path: str) -> str:
-        return path.replace('/', '\\') if sys.platform.startswith('win') else path
+    # Longest prefix first, computed once instead of per command
+    _SORTED_CMD_KEYS = tuple(sorted(WINDOWS_CMD_MAP, key=len, reverse=True))
+
+    # Platform branch resolved once at import, not per path
+    if IS_WINDOWS:
+        @staticmethod
+        def normalize_path(path: str) -> str:
+            return path.replace('/', '\\')
+    else:
+        @staticmethod
+        def normalize_path(path: str) -> str:
+            return path
 
     @staticmethod
     def convert_to_native(command: str) -> str:
         """Smartly translates Unix commands to Windows if running on Windows."""
-        if not sys.platform.startswith('win'): return command
+        if not IS_WINDOWS: return command
         
         cmd_lower = command.lower().strip()
-        sorted_keys = sorted(VibeUtils.WINDOWS_CMD_MAP.keys(), key=len, reverse=True)
         
-        for unix_cmd in sorted_keys:
+        for unix_cmd in VibeUtils._SORTED_CMD_KEYS:
             if cmd_lower.startswith(unix_cmd):
                 # Ensure whole word match (prevent 'rm' matching 'rmdir')
                 match_len = len(unix_cmd)
@@ -130,39 +175,46 @@ class VibeUtils:
                     return f"{win_cmd} {rest}" if rest else win_cmd
         return command
 
+    @staticmethod
+    def _fix_vite(command: str, cmd_lower: str) -> tuple[str, str]:
+        fixed_cmd = command
+        warning = ""
+        if "--yes" not in cmd_lower and "-y" not in cmd_lower:
+            fixed_cmd = fixed_cmd.replace("npm create", "npm create --yes").replace("npx create-vite", "npx --yes create-vite")
+        if "--template" not in cmd_lower:
+            warning = "⚠️  Vite: Added default --template react-ts"
+            fixed_cmd += " --template react-ts"
+        return fixed_cmd, warning
+
+    @staticmethod
+    def _fix_next(command: str, cmd_lower: str) -> tuple[str, str]:
+        if "--yes" not in cmd_lower:
+            return command + " --yes", "⚠️  Next.js: Added --yes flag"
+        return command, ""
+
+    @staticmethod
+    def _fix_shadcn(command: str, cmd_lower: str) -> tuple[str, str]:
+        if "-y" not in cmd_lower and "--yes" not in cmd_lower:
+            return command + " -y", ""
+        return command, ""
+
     @staticmethod
     def auto_fix_interactive(command: str) -> tuple[str, str]:
         """Injects non-interactive flags (V2 Feature)."""
-        warnings = []
-        fixed_cmd = command
         cmd_lower = command.lower()
 
-        # Vite
-        if "create vite" in cmd_lower or "create-vite" in cmd_lower:
-            if "--yes" not in cmd_lower and "-y" not in cmd_lower:
-                fixed_cmd = fixed_cmd.replace("npm create", "npm create --yes").replace("npx create-vite", "npx --yes create-vite")
-            if "--template" not in cmd_lower:
-                warnings.append("⚠️  Vite: Added default --template react-ts")
-                fixed_cmd += " --template react-ts"
-
-        # Next.js
-        elif "create-next-app" in cmd_lower:
-            if "--yes" not in cmd_lower:
-                warnings.append("⚠️  Next.js: Added --yes flag")
-                fixed_cmd += " --yes"
-        
-        # Shadcn
-        elif "shadcn" in cmd_lower:
-            if "-y" not in cmd_lower and "--yes" not in cmd_lower:
-                fixed_cmd += " -y"
-        
+        # Vite / Next.js / Shadcn: one regex scan finds the tools named; the first in
+        # _SCAFFOLD_FIXERS order wins (vite, then next, then shadcn), not the leftmost match
+        found = {m.lastgroup for m in _SCAFFOLD_RE.finditer(command)}
+        for name, fix in _SCAFFOLD_FIXERS.items():
+            if name in found:
+                return fix(command, cmd_lower)
+
         # Generic Init
-        elif cmd_lower.strip().endswith("init"):
-            if "-y" not in cmd_lower:
-                warnings.append("⚠️  Init: Added -y flag")
-                fixed_cmd += " -y"
+        if cmd_lower.rstrip().endswith("init") and "-y" not in cmd_lower:
+            return command + " -y", "⚠️  Init: Added -y flag"
 
-        return fixed_cmd, "\n".join(warnings)
+        return command, ""
 
     @staticmethod
     def is_dangerous(command: str) -> bool:
@@ -174,15 +226,54 @@ class VibeUtils:
         return False
 
     @staticmethod
-    def get_diff(old: str, new: str, filename: str) -> str:
+    def get_diff_iter(old: str, new: str, filename: str):
+        """Yields colored diff lines (newline-terminated) so callers can stream them."""
+        if max(len(old), len(new)) > MAX_DIFF_BYTES:
+            yield "(diff skipped: large file)\n"
+            return
         diff = difflib.unified_diff(old.splitlines(), new.splitlines(), fromfile=f"a/{filename}", tofile=f"b/{filename}", lineterm="")
-        out = []
         for line in diff:
-            if line.startswith('+'): out.append(Fore.GREEN + line + Style.RESET_ALL)
-            elif line.startswith('-'): out.append(Fore.RED + line + Style.RESET_ALL)
-            elif line.startswith('^'): out.append(Fore.BLUE + line + Style.RESET_ALL)
-            else: out.append(line)
-        return "\n".join(out)
+            if line.startswith('+'): yield Fore.GREEN + line + Style.RESET_ALL + "\n"
+            elif line.startswith('-'): yield Fore.RED + line + Style.RESET_ALL + "\n"
+            elif line.startswith('^'): yield Fore.BLUE + line + Style.RESET_ALL + "\n"
+            else: yield line + "\n"
+
+    @staticmethod
+    def get_diff(old: str, new: str, filename: str) -> str:
+        return "".join(VibeUtils.get_diff_iter(old, new, filename)).rstrip("\n")
+
+_SCAFFOLD_FIXERS = {
+    'vite': VibeUtils._fix_vite,
+    'next': VibeUtils._fix_next,
+    'shadcn': VibeUtils._fix_shadcn,
+}
+
+def fast_rmtree(root: Path, workers: int = 32):
+    """Deletes a directory tree: files are unlinked in parallel, then dirs are removed bottom-up."""
+    files, dirs = [], []
+    for dirpath, dirnames, filenames in os.walk(root, topdown=False):
+        files.extend(os.path.join(dirpath, f) for f in filenames)
+        # os.walk doesn't descend into symlinked dirs; the link itself still has to go
+        files.extend(p for p in (os.path.join(dirpath, d) for d in dirnames) if os.path.islink(p))
+        dirs.append(dirpath)
+    with ThreadPoolExecutor(max_workers=workers) as ex:
+        list(ex.map(os.unlink, files))
+    for d in dirs:
+        os.rmdir(d)
+
+LOCKFILES = (("bun.lockb", "bun"), ("pnpm-lock.yaml", "pnpm"), ("yarn.lock", "yarn"))
+
+@functools.lru_cache(maxsize=128)
+def _detect_pm(root_str: str) -> str:
+    """One directory listing instead of a stat per lockfile; cached per root."""
+    try:
+        with os.scandir(root_str) as it:
+            names = {e.name for e in it}
+    except OSError:
+        return "npm"
+    for lock, mgr in LOCKFILES:
+        if lock in names: return mgr
+    return "npm"
 
 class PackageManager:
     def __init__(self, root: Path):
@@ -190,10 +281,7 @@ class PackageManager:
         self.type = self._detect()
 
     def _detect(self) -> str:
-        if (self.root / "bun.lockb").exists(): return "bun"
-        if (self.root / "pnpm-lock.yaml").exists(): return "pnpm"
-        if (self.root / "yarn.lock").exists(): return "yarn"
-        return "npm"
+        return _detect_pm(str(self.root))
 
     def get_install_cmd(self, pkg: str) -> str:
         map = {
@@ -283,7 +371,7 @@ class VibeAgent:
         if not quiet: print(Fore.CYAN + f"🔍 Scanning context: {self.cwd}..." + Style.RESET_ALL)
         try:
             tree = RepoContext.get_tree(self.cwd)
-            content = RepoContext.scrape(self.cwd)
+            content = "".join(RepoContext.scrape(self.cwd))
             
             context_msg = (
                 f"CURRENT CONTEXT (Updated {datetime.now().strftime('%H:%M:%S')}):\n"
@@ -311,6 +399,17 @@ class VibeAgent:
         if len(self.messages) > MAX_HISTORY_TURNS * 2:
             self.messages = self.messages[:2] + self.messages[-(MAX_HISTORY_TURNS * 2):]
 
+        # Shrink bulky tool output (READ dumps, RUN stdout) once it is a few turns old
+        turns_after = 0
+        for i in range(len(self.messages) - 1, 0, -1):
+            msg = self.messages[i]
+            if msg['role'] == 'user':
+                turns_after += 1
+            elif (turns_after >= ELIDE_AFTER_TURNS and msg['role'] == 'system'
+                  and len(msg['content']) > ELIDE_MSG_CHARS and "CURRENT CONTEXT" not in msg['content']):
+                content = msg['content']
+                self.messages[i] = {"role": "system", "content": f"SYSTEM: [elided {len(content)} chars — {content[:120]}...]"}
+
     # --- ACTION HANDLERS ---
 
     def handle_create(self, framework: str, name: str, flags: str = "") -> str:
@@ -360,7 +459,7 @@ class VibeAgent:
 
         if target.is_dir():
             print(Fore.YELLOW + "📂 Target is directory. Recursive scraping..." + Style.RESET_ALL)
-            content = RepoContext.scrape(target)
+            content = "".join(RepoContext.scrape(target))
             return f"SYSTEM: Directory Contents of '{path_str}':\n\n{content}"
         else:
             try:
@@ -372,7 +471,8 @@ class VibeAgent:
     def handle_write(self, path_str: str, content: str) -> str:
         """V2+V3 Logic: Write with Diff and Backup"""
         path_str = VibeUtils.normalize_path(path_str)
-        target = self.cwd / path_str
+        # Resolve symlinks so the link's target is backed up and replaced, not the link
+        target = Path(os.path.realpath(self.cwd / path_str))
         
         print(Fore.BLUE + f"\n📝 [WRITE] {path_str}" + Style.RESET_ALL)
 
@@ -380,7 +480,7 @@ class VibeAgent:
         if target.exists():
             try:
                 old = target.read_text(encoding='utf-8', errors='ignore')
-                print(VibeUtils.get_diff(old, content, path_str))
+                sys.stdout.writelines(VibeUtils.get_diff_iter(old, content, path_str))
             except: pass
         else:
             print(Fore.GREEN + "(New File)" + Style.RESET_ALL)
@@ -391,13 +491,27 @@ class VibeAgent:
             safe_name = path_str.replace("\\", "_").replace("/", "_")
             bak = self.backup_dir / f"{safe_name}_{ts}.bak"
             try:
-                shutil.copy2(target, bak)
-            except: pass
+                # Same filesystem: a hard link costs no data copy. Safe because the
+                # write below replaces the inode instead of truncating it.
+                os.link(target, bak)
+            except OSError:
+                try:
+                    shutil.copyfile(target, bak)
+                except: pass
 
         # Execute
         try:
             target.parent.mkdir(parents=True, exist_ok=True)
-            target.write_text(content, encoding='utf-8')
+            tmp = target.with_name(target.name + ".vibe-tmp")
+            try:
+                tmp.write_text(content, encoding='utf-8')
+                if target.exists():
+                    # The temp file gets umask defaults; keep the original mode (e.g. +x)
+                    shutil.copymode(target, tmp)
+                os.replace(tmp, target)
+            except BaseException:
+                tmp.unlink(missing_ok=True) # Never leave .vibe-tmp in the user's tree
+                raise
             print(Fore.GREEN + f"✅ Saved {path_str}" + Style.RESET_ALL)
             return f"SYSTEM: File {path_str} written successfully."
         except Exception as e:
@@ -432,94 +546,134 @@ class VibeAgent:
             confirm = input(Fore.RED + "🚨 DANGEROUS COMMAND. Type 'confirm' to run: " + Style.RESET_ALL)
             if confirm.lower() != 'confirm': return "SYSTEM: Command blocked by user."
 
-        # 5. Execution
+        # 5. Execution (streamed live; only the tail of each stream goes back to the LLM)
         try:
-            res = subprocess.run(
-                cmd, 
-                shell=True, 
-                cwd=self.cwd, 
-                capture_output=True, 
-                text=True, 
-                timeout=300,
-                input="y\n" # Enter key injection
+            proc = subprocess.Popen(
+                cmd,
+                shell=True,
+                cwd=self.cwd,
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                text=True,
+                bufsize=1,
+                start_new_session=not IS_WINDOWS # Own process group, so a timeout reaches grandchildren too
             )
-            
-            if res.stdout: print(res.stdout)
-            if res.stderr: print(Fore.RED + res.stderr + Style.RESET_ALL)
+            out_tail = deque(maxlen=RUN_TAIL_LINES)
+            err_tail = deque(maxlen=RUN_TAIL_LINES)
+            timed_out = threading.Event()
+
+            def _kill_group():
+                # proc.kill() alone only hits the shell; e.g. `npm run dev` would keep the pipes open
+                try:
+                    if IS_WINDOWS:
+                        proc.kill()
+                    else:
+                        os.killpg(proc.pid, signal.SIGKILL)
+                except OSError:
+                    pass
 
-            status = "Success" if res.returncode == 0 else f"Failed ({res.returncode})"
-            return f"SYSTEM: Command '{cmd}' finished. Status: {status}\nOutput:\n{res.stdout}\nErrors:\n{res.stderr}"
-        except subprocess.TimeoutExpired:
-            return "SYSTEM: Command timed out."
+            def _kill():
+                timed_out.set()
+                _kill_group()
+
+            def _drain_stderr():
+                for line in proc.stderr:
+                    print(Fore.RED + line.rstrip("\n") + Style.RESET_ALL)
+                    err_tail.append(line)
+
+            err_thread = threading.Thread(target=_drain_stderr, daemon=True)
+            err_thread.start()
+            timer = threading.Timer(300, _kill)
+            timer.daemon = True # Never keeps the interpreter alive on exit
+            timer.start()
+            try:
+                try:
+                    proc.stdin.write("y\n") # Enter key injection
+                    proc.stdin.close()
+                except OSError:
+                    pass # Process exited before reading stdin
+
+                for line in proc.stdout:
+                    print(line, end="")
+                    out_tail.append(line)
+                proc.wait()
+                err_thread.join()
+            except BaseException:
+                _kill_group()
+                proc.wait()
+                raise
+            finally:
+                timer.cancel() # Also on KeyboardInterrupt, which `except Exception` misses
+
+            if timed_out.is_set(): return "SYSTEM: Command timed out."
+            stdout, stderr = "".join(out_tail), "".join(err_tail)
+            status = "Success" if proc.returncode == 0 else f"Failed ({proc.returncode})"
+            return f"SYSTEM: Command '{cmd}' finished. Status: {status}\nOutput:\n{stdout}\nErrors:\n{stderr}"
         except Exception as e:
             return f"SYSTEM: Execution Error: {e}"
 
     # --- MAIN LOOP ---
 
-    def process_response(self, text: str) -> bool:
-        acted = False
-        
-        # Regex Patterns
-        patterns = {
-            'WRITE': r">>>\s*WRITE\s+(.+?)\s*\n(.*?)<<<",
-            'READ': r">>>\s*READ\s+(.+?)\s*<<<",
-            'RUN': r">>>\s*RUN\s+(.+?)\s*<<<",
-            'DELETE': r">>>\s*DELETE\s+(.+?)\s*<<<",
-            'INSTALL': r">>>\s*INSTALL\s+(.+?)\s*<<<",
-            'CREATE': r">>>\s*CREATE\s+(\S+)\s+(\S+)(?:\s+(.+?))?\s*<<<",
-            'TREE': r">>>\s*TREE\s*<<<"
-        }
-
-        # Execution Priority: READ/TREE -> WRITE -> DELETE -> CREATE/INSTALL/RUN
-        
-        # Read/Tree (Non-destructive)
-        for m in re.finditer(patterns['READ'], text, re.DOTALL):
-            self.messages.append({"role": "system", "content": self.handle_read(m.group(1).strip())})
-            acted = True
-        
-        if re.search(patterns['TREE'], text):
-             self.messages.append({"role": "system", "content": f"SYSTEM: Tree:\n{RepoContext.get_tree(self.cwd)}"})
-             acted = True
-
-        # Write
-        for m in re.finditer(patterns['WRITE'], text, re.DOTALL):
-            self.messages.append({"role": "system", "content": self.handle_write(m.group(1).strip(), m.group(2).strip())})
-            acted = True
-
-        # Delete
-        for m in re.finditer(patterns['DELETE'], text, re.DOTALL):
-            path = m.group(1).strip()
+    # One pattern for every command block, so a growing stream buffer can be scanned in a single pass
+    CMD_RE = re.compile(
+        r">>>\s*(?:"
+        r"WRITE\s+(?P<write>.+?)\s*\n(?P<body>.*?)"
+        r"|READ\s+(?P<read>.+?)"
+        r"|RUN\s+(?P<run>.+?)"
+        r"|DELETE\s+(?P<delete>.+?)"
+        r"|INSTALL\s+(?P<install>.+?)"
+        r"|CREATE\s+(?P<fw>\S+)\s+(?P<name>\S+)(?:\s+(?P<flags>.+?))??"
+        r"|(?P<tree>TREE)"
+        r")\s*<<<",
+        re.DOTALL
+    )
+
+    # Execution Priority: READ/TREE -> WRITE -> DELETE -> CREATE/INSTALL/RUN
+    PRIORITY = {'read': 0, 'tree': 0, 'write': 1, 'delete': 2, 'fw': 3, 'install': 4, 'run': 5}
+
+    def execute_block(self, m: re.Match) -> Optional[str]:
+        """Runs a single matched command block and returns the SYSTEM message (if any)."""
+        kind = self._kind(m)
+        if kind == 'read':
+            return self.handle_read(m.group('read').strip())
+        if kind == 'tree':
+            return f"SYSTEM: Tree:\n{RepoContext.get_tree(self.cwd)}"
+        if kind == 'write':
+            return self.handle_write(m.group('write').strip(), m.group('body').strip())
+        if kind == 'delete':
+            path = m.group('delete').strip()
             # Simple delete wrapper
             tgt = self.cwd / path
-            if tgt.exists():
-                try:
-                    if tgt.is_dir(): shutil.rmtree(tgt)
-                    else: tgt.unlink()
-                    self.messages.append({"role": "system", "content": f"SYSTEM: Deleted {path}"})
-                    print(Fore.RED + f"🗑️  Deleted {path}" + Style.RESET_ALL)
-                except Exception as e:
-                    self.messages.append({"role": "system", "content": f"Error deleting: {e}"})
-            acted = True
-
-        # Create
-        for m in re.finditer(patterns['CREATE'], text, re.DOTALL):
-            fw, name, flags = m.group(1), m.group(2), m.group(3)
-            self.messages.append({"role": "system", "content": self.handle_create(fw, name, flags or "")})
-            acted = True
-
-        # Install (Using Package Manager Logic)
-        for m in re.finditer(patterns['INSTALL'], text, re.DOTALL):
-            pkg = m.group(1).strip()
-            cmd = self.pkg_mgr.get_install_cmd(pkg)
-            self.messages.append({"role": "system", "content": self.handle_run(cmd)})
-            acted = True
-
-        # Run
-        for m in re.finditer(patterns['RUN'], text, re.DOTALL):
-            self.messages.append({"role": "system", "content": self.handle_run(m.group(1).strip())})
-            acted = True
-
-        return acted
+            if not tgt.exists(): return None
+            try:
+                if tgt.is_dir() and not tgt.is_symlink(): fast_rmtree(tgt)
+                else: tgt.unlink()
+                print(Fore.RED + f"🗑️  Deleted {path}" + Style.RESET_ALL)
+                return f"SYSTEM: Deleted {path}"
+            except Exception as e:
+                return f"Error deleting: {e}"
+        if kind == 'fw':
+            return self.handle_create(m.group('fw'), m.group('name'), m.group('flags') or "")
+        if kind == 'install':
+            # Install (Using Package Manager Logic)
+            return self.handle_run(self.pkg_mgr.get_install_cmd(m.group('install').strip()))
+        return self.handle_run(m.group('run').strip())
+
+    def process_response(self, text: str) -> bool:
+        """Executes every command block in a complete response, in priority order."""
+        matches = list(self.CMD_RE.finditer(text))
+        matches.sort(key=lambda m: self.PRIORITY[self._kind(m)])
+        for m in matches:
+            result = self.execute_block(m)
+            if result: self.messages.append({"role": "system", "content": result})
+        return bool(matches)
+
+    @staticmethod
+    def _kind(m: re.Match) -> str:
+        # lastgroup is the trailing group of the alternative that matched
+        kind = m.lastgroup
+        return {'body': 'write', 'name': 'fw', 'flags': 'fw'}.get(kind, kind)
 
     def run(self):
         print(Fore.CYAN + "==========================================")
@@ -543,6 +697,9 @@ class VibeAgent:
                 
                 # Streaming Response
                 full_resp = ""
+                parsed_upto = 0
+                acted = False
+                results = []
                 stream = self.client.chat.completions.create(
                     model=MODEL_NAME, messages=self.messages, stream=True, temperature=0.1, max_tokens=4000
                 )
@@ -552,6 +709,14 @@ class VibeAgent:
                     c = chunk.choices[0].delta.content or ""
                     full_resp += c
                     if ">>>" not in full_resp: print(c, end="", flush=True)
+
+                    # Execute Tools as soon as each block closes (only rescan when a '<<<' may have arrived)
+                    if "<<<" in full_resp[max(parsed_upto, len(full_resp) - len(c) - 2):]:
+                        for m in self.CMD_RE.finditer(full_resp, parsed_upto):
+                            acted = True
+                            parsed_upto = m.end()
+                            result = self.execute_block(m)
+                            if result: results.append(result)
                 
                 # Clean display of command blocks
                 clean_display = re.sub(r">>>.*?<<<", "", full_resp, flags=re.DOTALL).strip()
@@ -559,9 +724,9 @@ class VibeAgent:
                     print(Fore.GREEN + f"\n🤖 AI: {clean_display}" + Style.RESET_ALL)
                 
                 self.messages.append({"role": "assistant", "content": full_resp})
+                self.messages.extend({"role": "system", "content": r} for r in results)
 
-                # Execute Tools
-                if self.process_response(full_resp):
+                if acted:
                     # Auto Follow-up after action
                     print(Fore.CYAN + "\n🔄 Verifying actions..." + Style.RESET_ALL)
                     followup = self.client.chat.completions.create(
@@ -19,12 +19,17 @@ import sys
 import json
 import time
 import shutil
+import signal
 import difflib
+import hashlib
+import functools
 import subprocess
 import argparse
 import fnmatch
+import threading
 from pathlib import Path
 from datetime import datetime
+from collections import deque
 from typing import List, Tuple, Set, Dict, Optional, Any
 
 # Third-party imports
@@ -35,9 +40,15 @@ except ImportError:
     print("❌ Missing dependencies. Run: pip install openai python-dotenv")
     sys.exit(1)
 
+# Optional: C/Rust-accelerated patience diff for large files (pip install patiencediff)
+try:
+    import patiencediff
+except ImportError:
+    patiencediff = None
+
 # Import the scrape_contents function
 try:
-    from file_reader import scrape_contents
+    from file_reader import scrape_contents, MAX_FILE_BYTES
 except ImportError:
     print("❌ Missing file_reader module. Ensure file_reader.py is in the same directory.")
     sys.exit(1)
@@ -45,6 +56,7 @@ except ImportError:
 # Platform detection
 IS_WINDOWS = sys.platform.startswith('win')
 IS_UNIX = not IS_WINDOWS
+FOREIGN_SEP = '/' if IS_WINDOWS else '\\'
 
 # ==============================================================================
 # CONFIGURATION
@@ -56,8 +68,57 @@ IS_UNIX = not IS_WINDOWS
 MODEL_NAME = "openrouter/pony-alpha" 
 
 # Security & Limits
-DANGEROUS_COMMANDS = {'rm', 'del', 'format', 'mkfs', 'dd', 'shutdown', 'reboot', 'diskpart'}
-MAX_HISTORY_TURNS = 15
+DANGEROUS_COMMANDS = frozenset({'rm', 'del', 'format', 'mkfs', 'dd', 'shutdown', 'reboot', 'diskpart'})
+# Recursive rm anywhere in the line (-r, -rf, -fr, --recursive) or rm of a bare '/'
+DANGER_RM_RE = re.compile(r"\brm\b.*(?:\s-[a-z]*r|\s--recursive\b|\s/(?:\s|$))", re.IGNORECASE)
+# Windows: recursive del/rmdir/rd that names a drive root (flags in any order)
+DANGER_WIN_RE = re.compile(
+    r"^(?=.*\b(?:del|rmdir|rd)\b)(?=.*/s\b)(?=.*\b[cd]:\\)", re.IGNORECASE
+) if IS_WINDOWS else None
+# History budget: tokens are estimated as chars / 4; past SUMMARIZE_AT of the window the
+# oldest turns are folded into one summary message (no extra LLM call)
+CONTEXT_WINDOW = 128_000  # Tokens; conservative for MODEL_NAME
+SUMMARIZE_AT = 0.8
+KEEP_RECENT_MESSAGES = 6  # Newest messages always kept verbatim
+SUMMARY_MAX_LINES = 40
+COUNT_FILES_LIMIT = 10_000  # DELETE's size preview stops counting here
+# Prompt caching: the pinned system messages are sent as text parts carrying this marker,
+# so providers that honour it (Anthropic/Gemini via OpenRouter) reuse the cached prefix;
+# OpenAI-style providers cache identical prefixes on their own and ignore it
+PROMPT_CACHE_CONTROL = {"type": "ephemeral"}
+
+# Folders and files to hide from the tree view (dot-entries are hidden too, except these)
+TREE_IGNORE = frozenset({
+    'node_modules', '.git', '.vs', '.vscode', '.idea', '__pycache__',
+    'dist', 'build', 'coverage', '.next', '.nuxt', '.output',
+    '.vibe', 'package-lock.json', 'pnpm-lock.yaml', 'yarn.lock', 'bun.lockb',
+    'Thumbs.db', '.DS_Store'
+})
+TREE_KEEP_DOTFILES = frozenset({'.env', '.gitignore'})
+# Commonly skipped large directories, reported down to 2 levels deep; they are
+# listed in the tree but never opened, so e.g. venv/ costs no readdir at all
+SKIP_DIR_PATTERNS = frozenset({
+    'node_modules', '.git', '__pycache__', '.venv', 'venv', 'dist',
+    'build', '.next', '.nuxt', 'target', 'vendor', '.vibe'
+})
+
+# RUN command classification: each phrase list is one case-insensitive scan (plain
+# substring semantics, as before, without lowercasing a copy of the command)
+CREATE_CMD_PATTERNS = (
+    'npm create', 'npx create', 'yarn create', 'pnpm create',
+    'npm init', 'yarn init', 'pnpm init'
+)
+SERVER_CMD_PATTERNS = (
+    'npm run dev', 'npm start', 'yarn dev', 'yarn start',
+    'pnpm dev', 'pnpm start', 'bun dev', 'bun run dev',
+    'python manage.py runserver', 'uvicorn', 'nodemon'
+)
+CREATE_CMD_RE = re.compile("|".join(map(re.escape, CREATE_CMD_PATTERNS)), re.IGNORECASE)
+SERVER_CMD_RE = re.compile("|".join(map(re.escape, SERVER_CMD_PATTERNS)), re.IGNORECASE)
+RUN_TIMEOUT = 300  # Seconds before a RUN command is killed
+RUN_TAIL_LINES = 200  # Output lines of a RUN command kept for the AI (all are printed live)
+BACKUP_MAX_BYTES = 2 * 1024 * 1024  # WRITE skips backing up files larger than this
+BACKUP_SNIFF_BYTES = 8192  # Head bytes checked for NUL before backing up
 
 # ==============================================================================
 # WINDOWS COMMAND MAPPINGS
@@ -81,6 +142,30 @@ WINDOWS_CMD_MAP = {
     'which': 'where',
 }
 
+
+def _build_cmd_trie(mapping: Dict[str, str]) -> Dict:
+    """Builds a char trie of the Unix commands; a None key marks a terminal holding the Windows command."""
+    trie: Dict = {}
+    for unix_cmd, win_cmd in mapping.items():
+        node = trie
+        for ch in unix_cmd:
+            node = node.setdefault(ch, {})
+        node[None] = win_cmd
+    return trie
+
+
+# Built once at import so lookups are a single walk over the command's head
+WINDOWS_CMD_TRIE = _build_cmd_trie(WINDOWS_CMD_MAP)
+WINDOWS_CMD_MAX_LEN = max(map(len, WINDOWS_CMD_MAP))
+
+# Diff line prefix -> ANSI color (green add, red remove, blue hint)
+DIFF_COLORS = {'+': '\033[92m', '-': '\033[91m', '^': '\033[94m'}
+ANSI_RESET = '\033[0m'
+DIFF_CONTEXT = 3
+UNIFORM_EDIT_MIN_LINES = 500  # Min equal line count before the uniform-edit guard kicks in
+PATIENCE_MIN_LINES = 200  # Changed-window size above which patiencediff is used (if installed)
+HUNK_HEADER_RE = re.compile(r"^@@ -(\d+)((?:,\d+)?) \+(\d+)((?:,\d+)?) @@")
+
 # ==============================================================================
 # SYSTEM PROMPT
 # ==============================================================================
@@ -156,6 +241,47 @@ RULES:
 - Available CREATE templates: vite-react, vite-react-ts, next, astro, remix, nuxt, expo, t3, and more.
 """
 
+# Heads the per-file listing that stands in for file contents in the repo context
+FILE_INDEX_HEADER = "FILE INDEX (path, size in bytes, modified epoch secs; use READ to see contents):"
+
+# Leading command verb -> intent, used instead of the classifier call for explicit input
+FAST_INTENTS = {
+    'tree': 'TREE', 'ls': 'LISTFILES', 'cd': 'CD', 'read': 'READ', 'cat': 'READ',
+    'rm': 'DELETE', 'refresh': 'REFRESH', 'run': 'RUN',
+}
+
+# Heads the message that stands in for summarized older turns
+SUMMARY_HEADER = "EARLIER CONVERSATION (older turns summarized to save context):"
+
+# All tool-call blocks in one alternation, compiled once at import; m.lastgroup names the tool
+_TOOL_CALL_RE = re.compile(
+    r">>>\s*(?:"
+    r"(?P<WRITE>WRITE\s+(?P<wpath>.+?)\s*\n(?P<wbody>.*?))"
+    r"|(?P<READ>READ\s+(?P<rpath>.+?))"
+    r"|(?P<RUN>RUN\s+(?P<cmd>.+?))"
+    r"|(?P<REFRESH>REFRESH)"
+    r"|(?P<TREE>TREE)"
+    r"|(?P<LISTFILES>LISTFILES)"
+    r"|(?P<INSTALL>INSTALL\s+(?P<mgr>\w+)\s+(?P<pkg>.+?))"
+    r"|(?P<SHADCN>SHADCN\s+(?P<comp>.+?))"
+    r"|(?P<DELETE>DELETE\s+(?P<dpath>.+?))"
+    r"|(?P<CREATE>CREATE\s+(?P<framework>\S+)\s+(?P<project>\S+)(?:\s+(?P<options>.+?))??)"
+    r"|(?P<CD>CD\s+(?P<cdpath>.+?))"
+    r")\s*<<<",
+    re.DOTALL
+)
+
+# Tool -> group shown when summarizing a call (None: the tool name alone)
+TOOL_LABEL_GROUPS = {
+    'WRITE': 'wpath', 'READ': 'rpath', 'RUN': 'cmd', 'REFRESH': None, 'TREE': None,
+    'LISTFILES': None, 'INSTALL': 'pkg', 'SHADCN': 'comp', 'DELETE': 'dpath',
+    'CREATE': 'project', 'CD': 'cdpath',
+}
+
+# Argument-less tools: a repeat is skipped unless something changed the project in between
+IDEMPOTENT_TOOLS = frozenset({'TREE', 'LISTFILES', 'REFRESH'})
+MUTATING_TOOLS = frozenset({'WRITE', 'DELETE', 'RUN', 'INSTALL', 'CREATE', 'SHADCN', 'CD'})
+
 # ==============================================================================
 # UTILITY CLASSES
 # ==============================================================================
@@ -170,69 +296,206 @@ class VibeUtils:
             return f"yes '' | {command}"
     
     @staticmethod
-    def convert_unix_to_windows(command: str) -> str:
-        """Convert common Unix commands to Windows equivalents."""
+    def convert_unix_to_windows(command: str, quiet: bool = False) -> str:
+        """Convert common Unix commands to Windows equivalents (quiet=True suppresses the notice)."""
         if not IS_WINDOWS:
             return command
             
-        cmd_lower = command.lower().strip()
-        sorted_keys = sorted(WINDOWS_CMD_MAP.keys(), key=len, reverse=True)
+        cmd = command.strip()
         
-        for unix_cmd in sorted_keys:
-            if cmd_lower.startswith(unix_cmd):
-                match_len = len(unix_cmd)
-                if len(cmd_lower) == match_len or cmd_lower[match_len] == ' ':
-                    win_cmd = WINDOWS_CMD_MAP[unix_cmd]
-                    rest = command[match_len:].strip()
-                    converted = f"{win_cmd} {rest}" if rest else win_cmd
-                    print(f"🔧 Auto-converted: {command} → {converted}")
-                    return converted
+        # Only the head can match a key; lowercase it only if it has uppercase
+        # chars (islower() is a C-level scan, so the common all-lowercase
+        # command walks the trie with no allocation)
+        head = cmd[:WINDOWS_CMD_MAX_LEN]
+        if not head.islower():
+            head = head.lower()
         
-        return command
+        # Longest-prefix match: descend the trie, remembering the deepest terminal
+        # that ends on a word boundary (so 'rm' never matches 'rmdir')
+        node = WINDOWS_CMD_TRIE
+        match_len, win_cmd = 0, None
+        for i, ch in enumerate(head):
+            node = node.get(ch)
+            if node is None:
+                break
+            if None in node and (i + 1 == len(cmd) or cmd[i + 1] == ' '):
+                match_len, win_cmd = i + 1, node[None]
+        
+        if win_cmd is None:
+            return command
+        
+        rest = cmd[match_len:].strip()
+        converted = f"{win_cmd} {rest}" if rest else win_cmd
+        if not quiet:
+            sys.stdout.write(f"🔧 Auto-converted: {command} → {converted}\n")
+        return converted
     
     @staticmethod
     def is_dangerous(command: str) -> bool:
         """Check if command is potentially dangerous."""
-        parts = command.lower().split()
-        if not parts:
-            return False
-            
-        # Check against dangerous command list
-        if parts[0] in DANGEROUS_COMMANDS:
+        # Check against dangerous command list (head token only, split once on any whitespace)
+        head = command.split(None, 1)
+        if head and head[0].lower() in DANGEROUS_COMMANDS:
             return True
-            
-        # Check for dangerous patterns
-        if "rm" in command and ("-r" in command or "/ " in command):
+        
+        # Check for dangerous patterns: one precompiled scan each
+        if DANGER_RM_RE.search(command):
+            return True
+        if DANGER_WIN_RE is not None and DANGER_WIN_RE.search(command):
             return True
-        if IS_WINDOWS and ("del" in command or "rmdir" in command or "rd" in command):
-            if "/s" in command and ("c:\\" in command.lower() or "d:\\" in command.lower()):
-                return True
         
         return False
     
     @staticmethod
     def get_diff(old_content: str, new_content: str, filename: str) -> str:
         """Generate colored diff output."""
-        diff = difflib.unified_diff(
-            old_content.splitlines(),
-            new_content.splitlines(),
+        if old_content == new_content:
+            return ""
+        # Both sides must be real lists: unified_diff runs SequenceMatcher, which
+        # needs len() and slicing, so lazy line iterators can't be fed in here.
+        a = old_content.splitlines()
+        b = new_content.splitlines()
+        
+        # Strip identical leading/trailing lines (xdiff-style) so difflib only sees
+        # the changed window, keeping DIFF_CONTEXT lines so hunks are unchanged
+        pre, limit = 0, min(len(a), len(b))
+        while pre < limit and a[pre] == b[pre]:
+            pre += 1
+        suf, limit = 0, limit - pre
+        while suf < limit and a[-1 - suf] == b[-1 - suf]:
+            suf += 1
+        lo = max(pre - DIFF_CONTEXT, 0)
+        hi = max(suf - DIFF_CONTEXT, 0)
+        
+        a, b = a[lo:len(a) - hi], b[lo:len(b) - hi]
+        
+        # Large windows: patience diff avoids SequenceMatcher's worst cases;
+        # uniformly edited equal-length inputs skip matching entirely
+        if VibeUtils._is_uniform_edit(a, b, pre - lo):
+            unified_diff = VibeUtils._pairwise_diff
+        elif patiencediff is not None and max(len(a), len(b)) > PATIENCE_MIN_LINES:
+            unified_diff = patiencediff.unified_diff
+        else:
+            unified_diff = difflib.unified_diff
+        diff = unified_diff(
+            a,
+            b,
             fromfile=f"a/{filename}",
             tofile=f"b/{filename}",
-            lineterm=""
+            lineterm="",
+            n=DIFF_CONTEXT
         )
-        return "\n".join([
-            f"\033[92m{line}\033[0m" if line.startswith('+') else 
-            f"\033[91m{line}\033[0m" if line.startswith('-') else 
-            f"\033[94m{line}\033[0m" if line.startswith('^') else line 
+        if lo:
+            # Shift hunk headers back to whole-file line numbers
+            shift = lambda m: f"@@ -{int(m[1]) + lo}{m[2]} +{int(m[3]) + lo}{m[4]} @@"
+            diff = (HUNK_HEADER_RE.sub(shift, line, count=1) if line.startswith('@@') else line for line in diff)
+        # A single str join beats a pre-encoded bytearray buffer here (~1.5x on a
+        # 20k-line diff): per-line .encode() costs more than the f-string it saves
+        colors = DIFF_COLORS
+        return "\n".join(
+            f"{colors[line[:1]]}{line}{ANSI_RESET}" if line[:1] in colors else line
             for line in diff
-        ])
+        )
+    
+    @staticmethod
+    def _is_uniform_edit(a: List[str], b: List[str], first: int) -> bool:
+        """
+        Detects the degenerate input where difflib goes cubic: same line count and
+        every sampled line pair changed by the same amount (e.g. a column added
+        to each CSV row).
+        """
+        if len(a) != len(b) or len(a) <= UNIFORM_EDIT_MIN_LINES:
+            return False
+        pairs = list(zip(a[first:first + 10], b[first:first + 10]))
+        if len(pairs) < 10 or any(x == y for x, y in pairs):
+            return False
+        ratios = [difflib.SequenceMatcher(None, x, y).ratio() for x, y in pairs]
+        return max(ratios) - min(ratios) < 1e-6
+    
+    @staticmethod
+    def _pairwise_diff(a: List[str], b: List[str], fromfile: str, tofile: str,
+                       lineterm: str = "", n: int = DIFF_CONTEXT):
+        """Unified diff that pairs line i with line i (equal-length inputs only)."""
+        changed = [i for i, (x, y) in enumerate(zip(a, b)) if x != y]
+        if not changed:
+            return
+        yield f"--- {fromfile}{lineterm}"
+        yield f"+++ {tofile}{lineterm}"
+        
+        # Group changes whose context windows touch, like difflib's hunks
+        groups, start, prev = [], changed[0], changed[0]
+        for i in changed[1:]:
+            if i - prev > 2 * n:
+                groups.append((start, prev))
+                start = i
+            prev = i
+        groups.append((start, prev))
+        
+        for first, last in groups:
+            h_lo, h_hi = max(first - n, 0), min(last + n + 1, len(a))
+            length = h_hi - h_lo
+            span = f"{h_lo + 1}" if length == 1 else f"{h_lo + 1},{length}"
+            yield f"@@ -{span} +{span} @@{lineterm}"
+            i = h_lo
+            while i < h_hi:
+                if a[i] == b[i]:
+                    yield f" {a[i]}"
+                    i += 1
+                    continue
+                j = i
+                while j < h_hi and a[j] != b[j]:
+                    j += 1
+                yield from (f"-{line}" for line in a[i:j])
+                yield from (f"+{line}" for line in b[i:j])
+                i = j
     
     @staticmethod
     def normalize_path(path: str) -> str:
         """Normalize path to platform format."""
-        if IS_WINDOWS:
-            return path.replace('/', '\\')
-        return path.replace('\\', '/')
+        # Most paths already use the native separator: return them untouched
+        if FOREIGN_SEP not in path:
+            return path
+        return path.replace(FOREIGN_SEP, os.sep)
+    
+    @staticmethod
+    def count_files(root: Path, limit: int = COUNT_FILES_LIMIT) -> int:
+        """
+        Count files under root using scandir's cached entry types (no stat per file).
+        Stops once limit is reached: a confirmation prompt only needs "this many or more".
+        """
+        total = 0
+        stack = [root]
+        while stack:
+            try:
+                with os.scandir(stack.pop()) as it:
+                    for entry in it:
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append(entry.path)
+                        elif entry.is_file(follow_symlinks=False):
+                            total += 1
+                            if total >= limit:
+                                return total
+            except OSError:
+                continue
+        return total
+
+
+# Lock file -> package manager, in detection priority order
+LOCKFILES = (("bun.lockb", "bun"), ("pnpm-lock.yaml", "pnpm"), ("yarn.lock", "yarn"))
+
+
+@functools.lru_cache(maxsize=64)
+def _detect_cached(root: str) -> str:
+    """Detect package manager from one directory listing (cached per root)."""
+    try:
+        with os.scandir(root) as it:
+            names = {e.name for e in it}
+    except OSError:
+        return "npm"
+    for lock, mgr in LOCKFILES:
+        if lock in names:
+            return mgr
+    return "npm"
 
 
 class PackageManager:
@@ -244,13 +507,7 @@ class PackageManager:
     
     def _detect(self) -> str:
         """Auto-detect package manager from lock files."""
-        if (self.root_dir / "bun.lockb").exists():
-            return "bun"
-        if (self.root_dir / "pnpm-lock.yaml").exists():
-            return "pnpm"
-        if (self.root_dir / "yarn.lock").exists():
-            return "yarn"
-        return "npm"
+        return _detect_cached(str(self.root_dir))
     
     def get_install_cmd(self, package: str) -> str:
         """Get install command for detected package manager."""
@@ -263,6 +520,16 @@ class PackageManager:
         return cmds.get(self.manager, cmds["npm"])
 
 
+TEMPLATE_LIST = """
+Available CREATE templates:
+  Vite: vite-react, vite-react-ts, vite-vue, vite-svelte
+  Next.js: next, next-js, next-pages
+  Astro: astro, astro-blog
+  Others: remix, nuxt, expo, t3, solid, qwik
+  Aliases: react, vue, svelte (→ vite templates)
+"""
+
+
 class ProjectTemplates:
     """Predefined project scaffolding templates."""
     
@@ -296,25 +563,42 @@ class ProjectTemplates:
         'qwik': "npm create qwik@latest {name}",
     }
     
+    # Lookup tables derived once from TEMPLATES (it is never mutated at runtime).
+    # Each template has a single {name} slot, so it is pre-split into (prefix, suffix)
+    # and filled by concatenation instead of str.format.
+    _TEMPLATE_PARTS = {k.lower(): tuple(v.split('{name}', 1)) for k, v in TEMPLATES.items()}
+    _FUZZY_KEYS = tuple(_TEMPLATE_PARTS.items())
+    
+    @staticmethod
+    @functools.lru_cache(maxsize=256)
+    def _resolve(framework_lower: str) -> Tuple[Optional[str], Optional[Tuple[str, str]]]:
+        """Resolve a framework name to (template_key, (prefix, suffix)), or (None, None) if unknown."""
+        parts = ProjectTemplates._TEMPLATE_PARTS.get(framework_lower)
+        if parts is not None:
+            return framework_lower, parts
+        
+        # Fuzzy match
+        for key, parts in ProjectTemplates._FUZZY_KEYS:
+            if framework_lower in key or key in framework_lower:
+                return key, parts
+        return None, None
+    
     @classmethod
-    def get_command(cls, framework: str, project_name: str, options: str = "") -> Optional[str]:
-        """Get scaffolding command for framework."""
+    def get_command(cls, framework: str, project_name: str, options: str = "", quiet: bool = False) -> Optional[str]:
+        """Get scaffolding command for framework (quiet=True suppresses match notices)."""
         framework_lower = framework.lower()
+        key, parts = cls._resolve(framework_lower)
         
-        # Direct match
-        if framework_lower in cls.TEMPLATES:
-            command = cls.TEMPLATES[framework_lower].format(name=project_name)
+        if parts is not None:
+            # Substitute outside the cache so project names don't grow the key space
+            command = parts[0] + project_name + parts[1]
+            if key != framework_lower and not quiet:
+                sys.stdout.write(f"📝 Matched '{framework}' to template: {key}\n")
         else:
-            # Fuzzy match
-            for key, cmd in cls.TEMPLATES.items():
-                if framework_lower in key or key in framework_lower:
-                    command = cmd.format(name=project_name)
-                    print(f"📝 Matched '{framework}' to template: {key}")
-                    break
-            else:
-                # Fallback: generic npm create
-                print(f"⚠️  Unknown framework '{framework}'. Using generic npm create...")
-                command = f"npm create {framework}@latest {project_name} -- --yes"
+            # Fallback: generic npm create
+            if not quiet:
+                sys.stdout.write(f"⚠️  Unknown framework '{framework}'. Using generic npm create...\n")
+            command = f"npm create {framework}@latest {project_name} -- --yes"
         
         # Append custom options if provided
         if options:
@@ -322,85 +606,110 @@ class ProjectTemplates:
         
         return command
     
+    LIST_AVAILABLE = TEMPLATE_LIST
+    
     @classmethod
     def list_available(cls) -> str:
         """List all available templates."""
-        return """
-Available CREATE templates:
-  Vite: vite-react, vite-react-ts, vite-vue, vite-svelte
-  Next.js: next, next-js, next-pages
-  Astro: astro, astro-blog
-  Others: remix, nuxt, expo, t3, solid, qwik
-  Aliases: react, vue, svelte (→ vite templates)
-"""
+        return cls.LIST_AVAILABLE
 
 
 class InteractiveCommandFixer:
     """Auto-fixes interactive commands for non-interactive execution."""
     
+    # One scan finds the scaffolding tools named; group names pick the handler
+    TOOL_RE = re.compile(
+        r"(?P<vite>create[- ]vite)|(?P<next>create-next-app)|(?P<astro>create astro)"
+        r"|(?P<remix>create-remix)|(?P<shadcn>shadcn)",
+        re.IGNORECASE
+    )
+    GENERIC_CREATE_RE = re.compile(r"(?:npm|npx|yarn|pnpm) create", re.IGNORECASE)
+    
+    @staticmethod
+    def _fix_vite(command: str, has_yes: bool, has_tpl: bool) -> Tuple[str, List[str]]:
+        # Vite: Add --template flag if missing
+        if not has_yes:
+            command = command.replace("npm create", "npm create --yes")
+            command = command.replace("npx create-vite", "npx --yes create-vite")
+        if not has_tpl:
+            return f"{command} --template react-ts", ["⚠️  Vite detected without --template. Adding default react-ts."]
+        return command, []
+    
+    @staticmethod
+    def _fix_next(command: str, has_yes: bool, has_tpl: bool) -> Tuple[str, List[str]]:
+        # Next.js: Add --yes flag
+        if not has_yes:
+            return f"{command} --yes", ["⚠️  Next.js detected. Adding --yes flag."]
+        return command, []
+    
+    @staticmethod
+    def _fix_astro(command: str, has_yes: bool, has_tpl: bool) -> Tuple[str, List[str]]:
+        if not has_tpl:
+            return f"{command} --template minimal --yes", ["⚠️  Astro detected. Adding --template minimal."]
+        if "--yes" not in command:
+            return f"{command} --yes", []
+        return command, []
+    
+    @staticmethod
+    def _fix_remix(command: str, has_yes: bool, has_tpl: bool) -> Tuple[str, List[str]]:
+        if not has_tpl:
+            return f"{command} --template remix", ["⚠️  Remix detected. Consider adding --template flag."]
+        return command, []
+    
+    @staticmethod
+    def _fix_shadcn(command: str, has_yes: bool, has_tpl: bool) -> Tuple[str, List[str]]:
+        # shadcn: Ensure -y flag
+        if not has_yes:
+            return f"{command} -y", []
+        return command, []
+    
     @staticmethod
     def fix(command: str) -> Tuple[str, str]:
         """
         Detects and auto-fixes interactive commands.
         Returns: (fixed_command, warning_message)
         """
-        warnings = []
-        fixed_cmd = command
-        cmd_lower = command.lower()
-        
-        # Vite: Add --template flag if missing
-        if "create vite" in cmd_lower or "create-vite" in cmd_lower:
-            if "--yes" not in command and "-y" not in command:
-                command = command.replace("npm create", "npm create --yes")
-                command = command.replace("npx create-vite", "npx --yes create-vite")
-            
-            if "--template" not in command:
-                warnings.append("⚠️  Vite detected without --template. Adding default react-ts.")
-                fixed_cmd = f"{command} --template react-ts"
-            else:
-                fixed_cmd = command
-        
-        # Next.js: Add --yes flag
-        elif "create-next-app" in cmd_lower:
-            if "--yes" not in command and "-y" not in command:
-                warnings.append("⚠️  Next.js detected. Adding --yes flag.")
-                fixed_cmd = f"{command} --yes"
-        
-        # Astro
-        elif "create astro" in cmd_lower:
-            if "--template" not in command:
-                warnings.append("⚠️  Astro detected. Adding --template minimal.")
-                fixed_cmd = f"{command} --template minimal --yes"
-            elif "--yes" not in command:
-                fixed_cmd = f"{command} --yes"
+        fixed_cmd, warnings = command, []
+        # Flag scans done once and shared by every handler. '-y' must be its own
+        # token so names like 'my-yarn-app' don't count as a yes flag.
+        has_yes = "--yes" in command or " -y " in f" {command} "
+        has_tpl = "--template" in command
         
-        # Remix
-        elif "create-remix" in cmd_lower:
-            if "--template" not in command:
-                warnings.append("⚠️  Remix detected. Consider adding --template flag.")
-                fixed_cmd = f"{command} --template remix"
-        
-        # shadcn: Ensure -y flag
-        elif "shadcn" in cmd_lower:
-            if "-y" not in command and "--yes" not in command:
-                fixed_cmd = f"{command} -y"
+        # Every tool named in the command is collected; the first in COMMAND_FIXERS
+        # order (vite > next > astro > remix > shadcn) wins, not the leftmost match
+        found = {m.lastgroup for m in InteractiveCommandFixer.TOOL_RE.finditer(command)}
+        tool = next((name for name in COMMAND_FIXERS if name in found), None)
+        if tool:
+            fixed_cmd, warnings = COMMAND_FIXERS[tool](command, has_yes, has_tpl)
         
         # npm/pnpm/yarn init: Add -y flag
-        elif command.strip().endswith("init"):
-            if "-y" not in command and "--yes" not in command:
-                warnings.append("⚠️  Init command detected. Adding -y flag.")
+        elif command.rstrip().endswith("init"):
+            if not has_yes:
+                warnings = ["⚠️  Init command detected. Adding -y flag."]
                 fixed_cmd = f"{command} -y"
         
         # Generic create commands
-        elif any(x in cmd_lower for x in ['npm create', 'npx create', 'yarn create', 'pnpm create']):
-            if "--" not in command and "--yes" not in command:
-                warnings.append("⚠️  Interactive create command detected.")
-                warnings.append("💡 TIP: Use --yes, -y, or --template flags to avoid prompts.")
+        elif InteractiveCommandFixer.GENERIC_CREATE_RE.search(command):
+            if "--" not in command:
+                warnings = [
+                    "⚠️  Interactive create command detected.",
+                    "💡 TIP: Use --yes, -y, or --template flags to avoid prompts.",
+                ]
         
         warning_msg = "\n".join(warnings) if warnings else ""
         return fixed_cmd, warning_msg
 
 
+# Tool name (TOOL_RE group) -> handler, in priority order
+COMMAND_FIXERS = {
+    'vite': InteractiveCommandFixer._fix_vite,
+    'next': InteractiveCommandFixer._fix_next,
+    'astro': InteractiveCommandFixer._fix_astro,
+    'remix': InteractiveCommandFixer._fix_remix,
+    'shadcn': InteractiveCommandFixer._fix_shadcn,
+}
+
+
 # ==============================================================================
 # MAIN AGENT
 # ==============================================================================
@@ -430,8 +739,18 @@ class VibeAgent:
             default_headers={"X-Title": "VibeCLI-Unified"}
         )
         
-        # Initialize message history with system prompt
-        self.messages = [{"role": "system", "content": SYSTEM_INSTRUCTION}]
+        # System prompt (+ repo context) stay pinned; conversation turns live in a deque
+        # so pruning pops the oldest in O(1) instead of re-slicing the whole list
+        self._system = [{"role": "system", "content": SYSTEM_INSTRUCTION}]
+        self._history: deque = deque()
+        
+        # (mtime of every directory listed, rendered tree, skipped dirs, files) from one
+        # walk; a directory's mtime moves whenever an entry in it is added, removed or renamed
+        self._tree_cache: Optional[Tuple[Dict[str, int], str, List[str], List[str]]] = None
+        
+        # Last repo context string and the blake2b digest of the metadata it was built from
+        self._context_key: Optional[bytes] = None
+        self._context_str = ""
         
         # Load initial context
         if not skip_context:
@@ -443,22 +762,14 @@ class VibeAgent:
         """Load initial repository context."""
         print(f"🔍 Scanning repo: {self.root_dir}...")
         try:
-            repo_context = scrape_contents(self.root_dir)
-            
-            # Get directory structure
-            tree_output = self._get_tree_output()
+            # Structure plus a file index only; contents are fetched on demand via READ
+            combined_context, _ = self._build_context(force=True)
             
-            # Combine structure and contents
-            combined_context = (
-                f"DIRECTORY STRUCTURE:\n{tree_output}\n\n"
-                f"FILE CONTENTS:\n{repo_context}"
-            )
-            
-            char_count = len(repo_context)
-            print(f"✅ Context Loaded. ({char_count:,} characters)")
+            char_count = len(combined_context)
+            print(f"✅ Context Loaded. ({char_count:,} characters of structure and file index)")
             
             # Add context as system message
-            self.messages.append({
+            self._system.append({
                 "role": "system",
                 "content": f"HERE IS THE CURRENT REPO CONTEXT:\n\n{combined_context}"
             })
@@ -466,106 +777,214 @@ class VibeAgent:
             print(f"⚠️  Warning: Failed to load repo context: {e}")
             print("Continuing without initial context...")
     
-    def _get_tree_output(self) -> str:
+    def _tree_is_fresh(self) -> bool:
+        """True if no directory listed by the cached tree has changed since (one stat each)."""
+        if self._tree_cache is None:
+            return False
+        try:
+            return all(os.stat(path).st_mtime_ns == mtime for path, mtime in self._tree_cache[0].items())
+        except OSError:
+            return False
+    
+    def _walk_repo(self) -> Tuple[Dict[str, int], str, List[str], List[str]]:
         """
-        Generates a clean directory tree using Python (instead of system 'tree').
-        This intentionally hides node_modules, .git, and build artifacts.
+        Single scandir pass over the repo feeding the tree, the skipped-directory list and
+        the file index: returns (mtime of every listed directory, tree string, skipped
+        dirs, relative paths of the files shown in the tree).
         """
-        # Folders and files to hide from the tree view
-        IGNORE_LIST = {
-            'node_modules', '.git', '.vs', '.vscode', '.idea', '__pycache__',
-            'dist', 'build', 'coverage', '.next', '.nuxt', '.output',
-            '.vibe', 'package-lock.json', 'pnpm-lock.yaml', 'yarn.lock', 'bun.lockb',
-            'Thumbs.db', '.DS_Store'
-        }
-
-        def _generate_tree(root_path: Path, prefix: str = "") -> str:
-            output = []
+        skip_patterns = SKIP_DIR_PATTERNS
+        
+        def keep(name: str) -> bool:
+            # 1. Exact match ignore
+            if name in TREE_IGNORE:
+                return False
+            # 2. Ignore generic dot-folders (like .cache), but keep .env and .gitignore
+            return not name.startswith('.') or name in TREE_KEEP_DOTFILES
+
+        def _list(path: str, prefix: str, depth: int) -> List[Tuple[bool, os.DirEntry]]:
+            """Visible entries of one directory, sorted; records skipped dirs on the way."""
+            entries = []
             try:
-                # Get all items, sorted by name (Directories first looks nicer, but alphabetic is standard)
-                # We sort so the tree is deterministic
-                items = sorted(
-                    [p for p in root_path.iterdir()],
-                    key=lambda x: (not x.is_dir(), x.name.lower())
-                )
+                # One scandir per directory: DirEntry carries the d_type from readdir, so
+                # is_dir(follow_symlinks=False) needs no stat and no Path is built per item
+                with os.scandir(path) as it:
+                    for e in it:
+                        name = e.name
+                        if depth <= 2 and name in skip_patterns and e.is_dir():
+                            skipped.append(os.path.relpath(e.path, root))
+                        if keep(name):
+                            entries.append((e.is_dir(follow_symlinks=False), e))
             except PermissionError:
-                return f"{prefix}[Access Denied]"
-
-            # Filter out ignored items
-            filtered_items = []
-            for item in items:
-                # 1. Exact match ignore
-                if item.name in IGNORE_LIST: continue
-                # 2. Ignore generic dot-folders (like .cache), but keep .env and .gitignore
-                if item.name.startswith('.') and item.name not in ['.env', '.gitignore']: continue
-                
-                filtered_items.append(item)
-
-            # Build the tree string
-            for i, path in enumerate(filtered_items):
-                is_last = (i == len(filtered_items) - 1)
-                connector = "└── " if is_last else "├── "
-                
-                output.append(f"{prefix}{connector}{path.name}")
-                
-                if path.is_dir():
-                    extension = "    " if is_last else "│   "
-                    # Recursively build the sub-tree
-                    output.append(_generate_tree(path, prefix + extension))
+                lines.append(f"{prefix}[Access Denied]")
+                return []
             
-            return "\n".join(output)
-
-        print("🌳 Generating clean directory tree (skipping node_modules & junk)...")
+            # Directories first, then by name, so the tree is deterministic
+            entries.sort(key=lambda t: (not t[0], t[1].name.lower()))
+            return entries
+        
+        root = str(self.root_dir)
+        root_len = len(os.path.join(root, ""))
+        dir_mtimes = {root: os.stat(root).st_mtime_ns}
+        skipped: List[str] = []
+        files: List[str] = []
+        lines: List[str] = []
         
+        # Iterative pre-order DFS: each stack frame is one directory's remaining entries.
+        # Every line goes straight into the flat `lines`, joined once at the end, and
+        # deep trees can't hit the recursion limit.
+        entries = _list(root, "", 0)
+        stack = [(iter(enumerate(entries)), len(entries) - 1, "", 0)]
+        while stack:
+            items, last, prefix, depth = stack[-1]
+            item = next(items, None)
+            if item is None:
+                stack.pop()
+                continue
+            
+            i, (is_dir, entry) = item
+            is_last = (i == last)
+            connector = "└── " if is_last else "├── "
+            lines.append(f"{prefix}{connector}{entry.name}")
+            
+            if not is_dir:
+                # Only real files (or links to them) go in the FILE INDEX: symlinked
+                # dirs and dangling links are shown in the tree but can't be READ
+                if entry.is_file():
+                    files.append(entry.path[root_len:])
+            elif entry.name not in skip_patterns:
+                dir_mtimes[entry.path] = entry.stat(follow_symlinks=False).st_mtime_ns
+                extension = "    " if is_last else "│   "
+                child_prefix = prefix + extension
+                children = _list(entry.path, child_prefix, depth + 1)
+                if children:
+                    stack.append((iter(enumerate(children)), len(children) - 1, child_prefix, depth + 1))
+        
+        tree_str = "\n".join(lines) or "(Empty Directory)"
+        return dir_mtimes, tree_str, sorted(set(skipped)), files
+    
+    def _repo_walk(self) -> Tuple[Dict[str, int], str, List[str], List[str]]:
+        """The cached _walk_repo result, redone only when a listed directory changed."""
+        if not self._tree_is_fresh():
+            print("🌳 Generating clean directory tree (skipping node_modules & junk)...")
+            self._tree_cache = self._walk_repo()
+        return self._tree_cache
+    
+    def _get_tree_output(self) -> str:
+        """
+        Generates a clean directory tree using Python (instead of system 'tree').
+        This intentionally hides node_modules, .git, and build artifacts.
+        Reuses the last tree while every directory it listed keeps its mtime.
+        """
         try:
-            tree_str = _generate_tree(self.root_dir)
-            if not tree_str:
-                return "(Empty Directory)"
-            return tree_str
+            return self._repo_walk()[1]
         except Exception as e:
             return f"[Error generating tree: {e}]"
         
     def _find_skipped_directories(self) -> List[str]:
-        """Find commonly skipped large directories."""
-        skip_patterns = [
-            'node_modules',
-            '.git',
-            '__pycache__',
-            '.venv',
-            'venv',
-            'dist',
-            'build',
-            '.next',
-            '.nuxt',
-            'target',
-            'vendor',
-            '.vibe'
-        ]
-        
-        found_dirs = []
+        """Find commonly skipped large directories (collected by the same walk as the tree)."""
         try:
-            for root, dirs, _ in os.walk(self.root_dir):
-                # Only search 2 levels deep to avoid performance issues
-                depth = root[len(str(self.root_dir)):].count(os.sep)
-                if depth > 2:
-                    dirs[:] = []  # Don't recurse deeper
-                    continue
-                
-                for skip_pattern in skip_patterns:
-                    if skip_pattern in dirs:
-                        rel_path = os.path.relpath(os.path.join(root, skip_pattern), self.root_dir)
-                        found_dirs.append(rel_path)
+            return self._repo_walk()[2]
         except Exception:
-            pass
+            return []
+    
+    def _build_context(self, force: bool = False) -> Tuple[str, bool]:
+        """
+        Repo context (tree + one "path, size, mtime" line per file) and whether it
+        changed since the last build. File paths come from the cached walk; sizes are
+        stat'ed fresh, since an edit in place doesn't touch the directory mtime. The
+        cached string is reused while the blake2b digest of the metadata matches.
+        """
+        tree_output = self._get_tree_output()
+        root = str(self.root_dir)
+        digest = hashlib.blake2b(tree_output.encode(), digest_size=16)
+        lines = []
+        for rel in self._repo_walk()[3]:
+            try:
+                st = os.stat(os.path.join(root, rel))
+            except OSError:
+                continue
+            digest.update(f"{rel}\0{st.st_size}\0{st.st_mtime_ns}\n".encode())
+            lines.append(f"{rel}\t{st.st_size}\t{int(st.st_mtime)}")
         
-        return sorted(set(found_dirs))  # Remove duplicates and sort
+        key = digest.digest()
+        if not force and key == self._context_key:
+            return self._context_str, False
+        
+        file_index = "\n".join(lines) if lines else "(No files)"
+        self._context_key = key
+        self._context_str = (
+            f"DIRECTORY STRUCTURE:\n{tree_output}\n\n"
+            f"{FILE_INDEX_HEADER}\n{file_index}"
+        )
+        return self._context_str, True
+    
+    @staticmethod
+    def _estimate_tokens(msg: Dict[str, str]) -> int:
+        """Rough token count (~4 chars per token), good enough for budgeting."""
+        return (len(msg['content']) + len(msg['role'])) // 4
+    
+    @staticmethod
+    def _summarize(messages: List[Dict[str, str]]) -> Dict[str, str]:
+        """
+        Heuristic summary of old turns: what the user asked and which tools the
+        assistant called. Tool results are dropped; an earlier summary is carried over.
+        """
+        lines = []
+        for msg in messages:
+            content = msg['content']
+            if content.startswith(SUMMARY_HEADER):
+                lines.extend(content.splitlines()[1:])
+            elif msg['role'] == 'user':
+                request = " ".join(content.split("User Request: ", 1)[-1].split())
+                lines.append(f"- User asked: {request[:120]}")
+            elif msg['role'] == 'assistant':
+                actions = []
+                for m in _TOOL_CALL_RE.finditer(content):
+                    group = TOOL_LABEL_GROUPS[m.lastgroup]
+                    actions.append(f"{m.lastgroup} {m[group].strip()[:60]}" if group else m.lastgroup)
+                if actions:
+                    lines.append(f"- Assistant did: {'; '.join(actions)}")
+        lines = lines[-SUMMARY_MAX_LINES:]
+        return {"role": "system", "content": "\n".join([SUMMARY_HEADER, *lines])}
     
     def _prune_history(self):
-        """Prune conversation history to maintain context limits."""
-        if len(self.messages) > MAX_HISTORY_TURNS * 2:
-            system_msgs = self.messages[:2]
-            conversation = self.messages[2:]
-            self.messages = system_msgs + conversation[-(MAX_HISTORY_TURNS * 2):]
+        """
+        Keep the conversation inside the token budget: once the estimate passes
+        SUMMARIZE_AT of CONTEXT_WINDOW, fold the oldest turns into one summary.
+        The pinned system messages and the newest messages are never touched.
+        """
+        budget = int(SUMMARIZE_AT * CONTEXT_WINDOW)
+        total = sum(map(self._estimate_tokens, self.messages))
+        if total <= budget:
+            return
+        
+        folded = []
+        while len(self._history) > KEEP_RECENT_MESSAGES and total > budget:
+            msg = self._history.popleft()
+            total -= self._estimate_tokens(msg)
+            folded.append(msg)
+        if folded:
+            self._history.appendleft(self._summarize(folded))
+    
+    @property
+    def messages(self) -> List[Dict[str, str]]:
+        """Full conversation as plain messages (pinned system entries first)."""
+        return self._system + list(self._history)
+    
+    def _request_messages(self) -> List[Dict]:
+        """
+        Message list for chat.completions.create. The pinned system entries carry a
+        cache_control marker and are byte-identical between turns (refresh_context only
+        replaces the repo context when it actually changed), so the provider can serve
+        them from its prompt cache; only the history after them is new each turn.
+        """
+        prefix = [
+            {"role": msg["role"], "content": [
+                {"type": "text", "text": msg["content"], "cache_control": PROMPT_CACHE_CONTROL}
+            ]}
+            for msg in self._system
+        ]
+        return prefix + list(self._history)
     
     # ==============================================================================
     # COMMAND HANDLERS
@@ -575,36 +994,29 @@ class VibeAgent:
         """Re-scan file system and update AI context."""
         print(f"\n🔄 Refreshing context from: {self.root_dir}...")
         try:
-            # Re-scrape contents
-            new_context = scrape_contents(self.root_dir)
-            
-            # Get updated directory structure
+            # Get updated directory structure and file index
+            combined_context, changed = self._build_context()
             tree_output = self._get_tree_output()
             
-            # Combine
-            combined_context = (
-                f"DIRECTORY STRUCTURE:\n{tree_output}\n\n"
-                f"FILE CONTENTS:\n{new_context}"
-            )
+            # The context message, when loaded, is the pinned entry after the system prompt
+            has_context = len(self._system) > 1
             
-            # Find and update context message
-            context_index = -1
-            for i, msg in enumerate(self.messages):
-                if msg['role'] == 'system' and "HERE IS THE CURRENT REPO CONTEXT" in msg['content']:
-                    context_index = i
-                    break
+            if has_context and not changed:
+                # Nothing on disk moved: keep the existing message as is
+                print("✅ Context unchanged.")
+                return f"SYSTEM: Context refreshed (no changes).\n\nCurrent Structure:\n{tree_output}"
             
             new_msg = {
                 "role": "system",
                 "content": f"HERE IS THE CURRENT REPO CONTEXT (Updated {datetime.now().strftime('%H:%M:%S')}):\n\n{combined_context}"
             }
             
-            if context_index != -1:
-                self.messages[context_index] = new_msg
+            if has_context:
+                self._system[1] = new_msg
             else:
-                self.messages.insert(1, new_msg)
+                self._system.append(new_msg)
             
-            print(f"✅ Context updated! ({len(new_context)} chars of content)")
+            print(f"✅ Context updated! ({len(combined_context)} chars of structure and file index)")
             return f"SYSTEM: Context refreshed.\n\nCurrent Structure:\n{tree_output}"
         except Exception as e:
             return f"SYSTEM: Error refreshing context: {e}"
@@ -654,8 +1066,8 @@ class VibeAgent:
         
         print(f"\n📖 [REQUEST] READ: {rel_path}")
         
-        # Security check
-        if not str(path).startswith(str(self.root_dir)):
+        # Security check (path-aware: a sibling like <root>-evil is not inside root)
+        if not path.is_relative_to(self.root_dir):
             return "SYSTEM: Error - Access denied. Can only read files inside project root."
         
         if not path.exists():
@@ -668,9 +1080,13 @@ class VibeAgent:
                 content = scrape_contents(path)
                 return f"SYSTEM: Scraped contents of directory '{rel_path}':\n\n{content}"
             
-            # File: Read it
+            # File: Read it (bounded, like the directory scrape, to protect the token budget)
             else:
-                content = path.read_text(encoding='utf-8', errors='ignore')
+                size = path.stat().st_size
+                if size > MAX_FILE_BYTES:
+                    return f"SYSTEM: Error - {rel_path} is too large to read ({size:,} bytes, limit {MAX_FILE_BYTES:,})."
+                with open(path, 'rb') as f:
+                    content = f.read().decode('utf-8', errors='ignore')
                 return f"SYSTEM: Content of {rel_path}:\n{content}"
         except Exception as e:
             return f"SYSTEM: Read error: {e}"
@@ -712,6 +1128,39 @@ class VibeAgent:
         except Exception as e:
             return f"SYSTEM: Error changing directory: {e}"
 
+    def _backup(self, path: Path, rel_path: str, link: bool = True) -> Path:
+        """
+        Snapshot a file into backup_dir. A hard link is one link(2) call and no data
+        copy, but shares the inode, so it is only safe when the original is unlinked
+        or replaced afterwards, never rewritten in place. Falls back to a copy (other
+        filesystem, no hard-link support, name already taken).
+        """
+        ts = datetime.now().strftime("%Y%m%d_%H%M%S")
+        safe_name = rel_path.replace("/", "_").replace("\\", "_")
+        bak = self.backup_dir / f"{safe_name}_{ts}.bak"
+        if link:
+            try:
+                os.link(path, bak)
+                return bak
+            except (OSError, NotImplementedError):
+                pass
+        shutil.copy2(path, bak)
+        return bak
+    
+    @staticmethod
+    def _backup_skip_reason(path: Path) -> Optional[str]:
+        """Why an existing file should not be backed up before WRITE, or None."""
+        try:
+            size = path.stat().st_size
+            if size > BACKUP_MAX_BYTES:
+                return f"{size:,} bytes, limit {BACKUP_MAX_BYTES:,}"
+            with open(path, 'rb') as f:
+                if b'\x00' in f.read(BACKUP_SNIFF_BYTES):
+                    return "binary file"
+        except OSError as e:
+            return str(e)
+        return None
+    
     def handle_write(self, rel_path: str, new_content: str) -> str:
         """Write content to file with diff preview and backup."""
         rel_path = VibeUtils.normalize_path(rel_path)
@@ -736,17 +1185,31 @@ class VibeAgent:
             return f"SYSTEM: User denied write to {rel_path}"
         
         try:
-            # Backup existing file
+            # Write through symlinks: back up and replace the link's target, not the link
+            path = Path(os.path.realpath(path))
+            
+            # Backup existing file (hard link is safe: the replace below swaps in a new inode)
             if exists:
-                ts = datetime.now().strftime("%Y%m%d_%H%M%S")
-                safe_name = rel_path.replace("/", "_").replace("\\", "_")
-                bak = self.backup_dir / f"{safe_name}_{ts}.bak"
-                shutil.copy2(path, bak)
-                print(f"💾 Backup saved: {bak.name}")
+                skip = self._backup_skip_reason(path)
+                if skip:
+                    print(f"⚠️  Backup skipped ({skip})")
+                else:
+                    bak = self._backup(path, rel_path)
+                    print(f"💾 Backup saved: {bak.name}")
             
-            # Write new content
+            # Write new content to a temp file, then atomically swap it in: readers never
+            # see a half-written file and a killed write leaves the original untouched
             path.parent.mkdir(parents=True, exist_ok=True)
-            path.write_text(new_content, encoding='utf-8')
+            tmp = path.with_name(path.name + ".tmp")
+            try:
+                tmp.write_text(new_content, encoding='utf-8')
+                if exists:
+                    shutil.copymode(path, tmp)  # Keep e.g. the executable bit
+                os.replace(tmp, path)
+            except BaseException:
+                tmp.unlink(missing_ok=True)
+                raise
+            self._tree_cache = None
             print(f"✅ Successfully wrote {rel_path}")
             return f"SYSTEM: File {rel_path} updated successfully."
         except Exception as e:
@@ -770,8 +1233,9 @@ class VibeAgent:
         # Show directory size if applicable
         if is_dir:
             try:
-                file_count = sum(1 for _ in path.rglob('*') if _.is_file())
-                print(f"⚠️  This directory contains {file_count} files")
+                file_count = VibeUtils.count_files(path)
+                shown = f"{file_count:,}+" if file_count >= COUNT_FILES_LIMIT else file_count
+                print(f"⚠️  This directory contains {shown} files")
             except:
                 pass
         
@@ -783,13 +1247,11 @@ class VibeAgent:
         try:
             # Backup file (not directories - too large)
             if not is_dir:
-                ts = datetime.now().strftime("%Y%m%d_%H%M%S")
-                safe_name = rel_path.replace("/", "_").replace("\\", "_")
-                bak = self.backup_dir / f"{safe_name}_{ts}.bak"
-                shutil.copy2(path, bak)
+                bak = self._backup(path, rel_path)
                 print(f"💾 Backup saved: {bak.name}")
             
             # Delete
+            self._tree_cache = None
             if is_dir:
                 shutil.rmtree(path)
                 print(f"✅ Successfully deleted directory {rel_path}")
@@ -841,12 +1303,7 @@ class VibeAgent:
 
         # 4. Interactive Fixes (npm create, etc.)
         original_cmd = command
-        is_create_cmd = any(x in command.lower() for x in [
-            'npm create', 'npx create', 'yarn create', 'pnpm create',
-            'npm init', 'yarn init', 'pnpm init'
-        ])
-
-        if is_create_cmd:
+        if CREATE_CMD_RE.search(command):
             command, warning = InteractiveCommandFixer.fix(command)
         else:
             warning = ""
@@ -858,13 +1315,7 @@ class VibeAgent:
                 print(f"📝 Modified: {original_cmd} → {command}")
 
         # --- SERVER GUARD 2.0 ---
-        server_patterns = [
-            'npm run dev', 'npm start', 'yarn dev', 'yarn start', 
-            'pnpm dev', 'pnpm start', 'bun dev', 'bun run dev',
-            'python manage.py runserver', 'uvicorn', 'nodemon'
-        ]
-
-        is_server = any(s in command.lower() for s in server_patterns)
+        is_server = SERVER_CMD_RE.search(command) is not None
 
         if is_server:
             print(f"\n⚠️  Likely Server Command Detected: '{command}'")
@@ -910,55 +1361,90 @@ class VibeAgent:
                 return "SYSTEM: User denied command execution."
 
         # 7. Execution
+        proc = None
         try:
             print("\n📟 Running command...")
             print("-" * 50)
 
-            # If it's a server run "here", this line blocks forever until Ctrl+C
-            res = subprocess.run(
+            # Output streams to the terminal as it arrives (stderr merged in); only the
+            # last RUN_TAIL_LINES lines are kept, so huge build logs never sit in memory.
+            # A new session lets a timeout kill the shell and everything it spawned.
+            proc = subprocess.Popen(
                 command,
                 shell=True,
                 cwd=self.current_cwd,
-                capture_output=True,
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
                 text=True,
-                timeout=300,
-                input="y\n"  # Auto-answer prompts
+                bufsize=1,
+                start_new_session=IS_UNIX
             )
-
-            # For non-servers or completed commands, print output
-            if res.stdout:
-                print("Output:")
-                # Truncate very long output
-                if len(res.stdout) > 2000:
-                    print(res.stdout[:2000] + "\n... (output truncated)")
-                else:
-                    print(res.stdout)
-
-            if res.stderr:
-                print("Error/Warnings:")
-                if len(res.stderr) > 2000:
-                    print(res.stderr[:2000] + "\n... (output truncated)")
-                else:
-                    print(res.stderr)
+            try:
+                proc.stdin.write("y\n")  # Auto-answer prompts
+                proc.stdin.close()
+            except OSError:
+                pass  # Exited without reading stdin
+
+            timed_out = threading.Event()
+            def _expire():
+                timed_out.set()
+                self._kill_proc(proc)
+            timer = threading.Timer(RUN_TIMEOUT, _expire)
+            timer.daemon = True
+            timer.start()
+
+            # If it's a server run "here", this loop blocks until Ctrl+C
+            tail = deque(maxlen=RUN_TAIL_LINES)
+            dropped = 0
+            try:
+                for line in proc.stdout:
+                    sys.stdout.write(line)
+                    sys.stdout.flush()
+                    if len(tail) == RUN_TAIL_LINES:
+                        dropped += 1
+                    tail.append(line)
+                returncode = proc.wait()
+            finally:
+                timer.cancel()
+
+            if timed_out.is_set():
+                print("\n❌ Command timeout (5 minutes)")
+                return "SYSTEM: Command timeout (5 minutes)"
 
             print("-" * 50)
 
-            if res.returncode == 0:
+            if returncode == 0:
                 print("✅ Command completed successfully")
             else:
-                print(f"⚠️  Command exited with code: {res.returncode}")
+                print(f"⚠️  Command exited with code: {returncode}")
 
-            return f"SYSTEM: Code: {res.returncode}\nOut: {res.stdout}\nErr: {res.stderr}"
+            output = "".join(tail)
+            if dropped:
+                output = f"... ({dropped} earlier lines truncated)\n{output}"
+            return f"SYSTEM: Code: {returncode}\nOut: {output}"
 
-        except subprocess.TimeoutExpired:
-            print("\n❌ Command timeout (5 minutes)")
-            return "SYSTEM: Command timeout (5 minutes)"
         except KeyboardInterrupt:
+            if proc is not None:
+                self._kill_proc(proc)
+                proc.wait()
             print("\n🛑 User stopped the command (Ctrl+C)")
             return "SYSTEM: User stopped the command (Ctrl+C)."
         except Exception as e:
             print(f"\n❌ Error executing command: {e}")
             return f"SYSTEM: Error: {e}"
+
+    @staticmethod
+    def _kill_proc(proc: subprocess.Popen):
+        """Kill a RUN command and (on Unix) its whole process group."""
+        try:
+            if IS_UNIX:
+                os.killpg(proc.pid, signal.SIGKILL)
+            else:
+                proc.kill()
+        except OSError:
+            pass
+
     def handle_install(self, manager: str, pkg: str) -> str:
         """Install package using detected package manager."""
         print(f"\n📦 [REQUEST] INSTALL: {pkg}")
@@ -977,6 +1463,7 @@ class VibeAgent:
         
         # 1. Run the scaffolding command
         result = self.handle_run(command)
+        self._tree_cache = None
         
         # 2. Check if it worked (Primitive check for success code or folder existence)
         # We check if the folder now exists to be sure.
@@ -1003,74 +1490,49 @@ class VibeAgent:
     # TOOL CALL PROCESSING
     # ==============================================================================
     
+    def execute_tool(self, m: re.Match) -> str:
+        """Dispatch one _TOOL_CALL_RE match to its handler."""
+        kind = m.lastgroup
+        if kind == 'READ':
+            return self.handle_read(m['rpath'].strip())
+        if kind == 'TREE':
+            return self.handle_tree()
+        if kind == 'LISTFILES':
+            return self.handle_listfiles()
+        if kind == 'WRITE':
+            return self.handle_write(m['wpath'].strip(), m['wbody'].strip())
+        if kind == 'CD':
+            return self.handle_cd(m['cdpath'].strip())
+        if kind == 'DELETE':
+            return self.handle_delete(m['dpath'].strip())
+        if kind == 'RUN':
+            return self.handle_run(m['cmd'].strip())
+        if kind == 'INSTALL':
+            return self.handle_install(m['mgr'].strip(), m['pkg'].strip())
+        if kind == 'CREATE':
+            options = m['options'].strip() if m['options'] else ""
+            return self.handle_create(m['framework'].strip(), m['project'].strip(), options)
+        if kind == 'SHADCN':
+            return self.handle_shadcn(m['comp'].strip())
+        return self.refresh_context()
+    
     def process_tool_calls(self, response_text: str) -> Tuple[List[str], bool]:
         """Parse and execute tool calls from AI response."""
         feedback = []
-        action_taken = False
-        
-        patterns = {
-            'WRITE': re.compile(r">>>\s*WRITE\s+(.+?)\s*\n(.*?)<<<", re.DOTALL),
-            'READ': re.compile(r">>>\s*READ\s+(.+?)\s*<<<", re.DOTALL),
-            'RUN': re.compile(r">>>\s*RUN\s+(.+?)\s*<<<", re.DOTALL),
-            'REFRESH': re.compile(r">>>\s*REFRESH\s*<<<", re.DOTALL),
-            'TREE': re.compile(r">>>\s*TREE\s*<<<", re.DOTALL),
-            'LISTFILES': re.compile(r">>>\s*LISTFILES\s*<<<", re.DOTALL),
-            'INSTALL': re.compile(r">>>\s*INSTALL\s+(\w+)\s+(.+?)\s*<<<", re.DOTALL),
-            'SHADCN': re.compile(r">>>\s*SHADCN\s+(.+?)\s*<<<", re.DOTALL),
-            'DELETE': re.compile(r">>>\s*DELETE\s+(.+?)\s*<<<", re.DOTALL),
-            'CREATE': re.compile(r">>>\s*CREATE\s+(\S+)\s+(\S+)(?:\s+(.+?))?\s*<<<", re.DOTALL),
-            'CD': re.compile(r">>>\s*CD\s+(.+?)\s*<<<", re.DOTALL),
-        }
-        
-        # Execution order: READ → TREE → LISTFILES → WRITE → DELETE → RUN → INSTALL → CREATE → SHADCN → REFRESH
-        
-        for path in patterns['READ'].findall(response_text):
-            feedback.append(self.handle_read(path.strip()))
-            action_taken = True
-        
-        for _ in patterns['TREE'].findall(response_text):
-            feedback.append(self.handle_tree())
-            action_taken = True
-        
-        for _ in patterns['LISTFILES'].findall(response_text):
-            feedback.append(self.handle_listfiles())
-            action_taken = True
-        
-        for path, content in patterns['WRITE'].findall(response_text):
-            feedback.append(self.handle_write(path.strip(), content.strip()))
-            action_taken = True
-
-        for path in patterns['CD'].findall(response_text):
-            feedback.append(self.handle_cd(path.strip()))
-            action_taken = True
+        seen = set()
         
-        for path in patterns['DELETE'].findall(response_text):
-            feedback.append(self.handle_delete(path.strip()))
-            action_taken = True
-        
-        for cmd in patterns['RUN'].findall(response_text):
-            feedback.append(self.handle_run(cmd.strip()))
-            action_taken = True
-        
-        for mgr, pkg in patterns['INSTALL'].findall(response_text):
-            feedback.append(self.handle_install(mgr.strip(), pkg.strip()))
-            action_taken = True
-        
-        for match in patterns['CREATE'].findall(response_text):
-            framework, project_name, options = match
-            options = options.strip() if options else ""
-            feedback.append(self.handle_create(framework.strip(), project_name.strip(), options))
-            action_taken = True
-        
-        for comp in patterns['SHADCN'].findall(response_text):
-            feedback.append(self.handle_shadcn(comp.strip()))
-            action_taken = True
-        
-        for _ in patterns['REFRESH'].findall(response_text):
-            feedback.append(self.refresh_context())
-            action_taken = True
+        # One scan over the response; tools run in the order the AI wrote them
+        for m in _TOOL_CALL_RE.finditer(response_text):
+            kind = m.lastgroup
+            if kind in IDEMPOTENT_TOOLS:
+                if kind in seen:
+                    continue
+                seen.add(kind)
+            elif kind in MUTATING_TOOLS:
+                seen.clear()
+            feedback.append(self.execute_tool(m))
         
-        return feedback, action_taken
+        return feedback, bool(feedback)
     
     # ==============================================================================
     # MAIN LOOP
@@ -1109,35 +1571,40 @@ class VibeAgent:
                 if not user_input.strip():
                     continue
                 
-                # 1. Ask AI to classify intent (Ghost Request)
-                # We don't save this to history permanently, we just use it to guide the next step.
-                intent_prompt = self.controlPrompt(user_input)
-                
-                print("✨ Analyzing intent...", end="", flush=True)
-                
-                # Quick non-streaming call for classification
-                intent_response = self.client.chat.completions.create(
-                    model="google/gemini-2.5-flash-lite:nitro",
-                    messages=[{"role": "user", "content": intent_prompt}],
-                    max_tokens=10,
-                    temperature=0.1 # Strict!
-                ).choices[0].message.content.strip()
-                
-                print(f"\r✨ Intent detected: [{intent_response}]")
+                # 1. Classify intent. An explicit command verb needs no model call;
+                # anything else asks the AI (Ghost Request).
+                intent_response = FAST_INTENTS.get(user_input.split(None, 1)[0].lower())
+                if intent_response is not None:
+                    print(f"✨ Intent detected: [{intent_response}]")
+                else:
+                    # We don't save this to history permanently, we just use it to guide the next step.
+                    intent_prompt = self.controlPrompt(user_input)
+                    
+                    print("✨ Analyzing intent...", end="", flush=True)
+                    
+                    # Quick non-streaming call for classification
+                    intent_response = self.client.chat.completions.create(
+                        model="google/gemini-2.5-flash-lite:nitro",
+                        messages=[{"role": "user", "content": intent_prompt}],
+                        max_tokens=10,
+                        temperature=0.1 # Strict!
+                    ).choices[0].message.content.strip()
+                    
+                    print(f"\r✨ Intent detected: [{intent_response}]")
                 
                 # 2. Handle the Intent
                 if intent_response == "CHAT":
                     # It's just talk. Add user input normally.
-                    self.messages.append({"role": "user", "content": user_input})
+                    self._history.append({"role": "user", "content": user_input})
                 else:
                     # It's an action! Force the AI to execute it.
                     # We prefix the input with the intent to make sure it follows through.
                     system_guidance = f"ACTION REQUIRED: {intent_response}. User Request: {user_input}"
-                    self.messages.append({"role": "user", "content": system_guidance})
+                    self._history.append({"role": "user", "content": system_guidance})
 
                 
                 # Add user message
-                # self.messages.append({"role": "user", "content": self.controlPrompt(user_input) })
+                # self._history.append({"role": "user", "content": self.controlPrompt(user_input) })
                 self._prune_history()
                 
                 # Stream AI response
@@ -1145,7 +1612,7 @@ class VibeAgent:
                 
                 stream = self.client.chat.completions.create(
                     model=MODEL_NAME,
-                    messages=self.messages,
+                    messages=self._request_messages(),
                     max_tokens=2000,
                     temperature=0.1,
                     stream=True
@@ -1164,7 +1631,7 @@ class VibeAgent:
                 
                 # Add assistant response to history
 
-                self.messages.append({"role": "assistant", "content": full_response})
+                self._history.append({"role": "assistant", "content": full_response})
                 
                 # Display clean response (without command blocks)
                 clean_display = re.sub(r">>>.*?<<<", "", full_response, flags=re.DOTALL).strip()
@@ -1176,7 +1643,7 @@ class VibeAgent:
                 
                 if acted:
                     tool_output = "SYSTEM: Results:\n" + "\n".join(feedback)
-                    self.messages.append({"role": "system", "content": tool_output})
+                    self._history.append({"role": "system", "content": tool_output})
                     
                     # Check for errors
                     has_errors = any("Error" in f or "denied" in f.lower() or "Blocked" in f for f in feedback)
@@ -1187,13 +1654,13 @@ class VibeAgent:
                         # Get follow-up response
                         followup = self.client.chat.completions.create(
                             model=MODEL_NAME,
-                            messages=self.messages,
+                            messages=self._request_messages(),
                             max_tokens=2000,
                             temperature=0.1
                         )
                         
                         f_text = followup.choices[0].message.content
-                        self.messages.append({"role": "assistant", "content": f_text})
+                        self._history.append({"role": "assistant", "content": f_text})
                         
                         clean_f = re.sub(r">>>.*?<<<", "", f_text, flags=re.DOTALL).strip()
                         if clean_f: